@@ -2,33 +2,113 @@
 Simple API for Git operations.
 """
 import os
+import shlex
+import subprocess
+from typing import Dict, List, Optional, Tuple
 from utils import exec_cmd, CmdResult
+from models.repository import RepoContent
+
+USER_NAME = "tester"
+USER_EMAIL = "a@b.c"
 
 def create_repo(path: str, default_branch: str = "main"):
     os.makedirs(path, exist_ok=True)
-    exec_cmd(f"git init --initial-branch={default_branch}", cwd=path)
-    exec_cmd('git config user.email "a@b.c"', cwd=path)
-    exec_cmd('git config user.name "tester"', cwd=path)
-    exec_cmd('git commit --allow-empty -m "Initial commit"', cwd=path)
+    exec_cmd(["git", "init", f"--initial-branch={default_branch}"], cwd=path, output="discard")
+    exec_cmd(["git", "config", "user.email", USER_EMAIL], cwd=path, output="discard")
+    exec_cmd(["git", "config", "user.name", USER_NAME], cwd=path, output="discard")
+    # test repositories are throwaway, don't pay for durable writes
+    exec_cmd(["git", "config", "core.fsync", "none"], cwd=path, output="discard")
+    exec_cmd(["git", "commit", "--allow-empty", "-m", "Initial commit"], cwd=path, output="discard")
+
+def run_batch(repo: str, *cmds: List[str]):
+    """Run `cmds` one after the other in a single `bash -c` invocation, stopping at the first failure."""
+    exec_cmd(["bash", "-c", " && ".join(shlex.join(cmd) for cmd in cmds)], cwd=repo, output="discard")
 
 def commit_file(repo: str, filename: str, content: str, msg: str):
     with open(os.path.join(repo, filename), "w") as f:
         f.write(content)
-    exec_cmd(f"git add {filename}", cwd=repo)
-    exec_cmd(f"git commit -m '{msg}'", cwd=repo)
+    run_batch(repo, ["git", "add", filename], ["git", "commit", "--quiet", "-m", msg])
+
+def _fast_import_data(text: str) -> bytes:
+    raw = text.encode()
+    return f"data {len(raw)}\n".encode() + raw + b"\n"
+
+def _fast_import_commits(branch: str, commits: List[Tuple[str, List[Tuple[str, str]]]], start_point: str) -> List[bytes]:
+    """fast-import commands that put `commits` on `branch`, the first one on top of `start_point`"""
+    stream = []
+    for idx, (msg, files) in enumerate(commits):
+        stream.append(f"commit refs/heads/{branch}\ncommitter {USER_NAME} <{USER_EMAIL}> now\n".encode())
+        stream.append(_fast_import_data(msg + "\n"))
+        if idx == 0:
+            # later commits follow the previous one in the stream
+            stream.append(f"from {start_point}\n".encode())
+        for filename, content in files:
+            stream.append(f"M 100644 inline {filename}\n".encode())
+            stream.append(_fast_import_data(content))
+    return stream
+
+def _run_fast_import(repo: str, stream: List[bytes], checkout_branch: str):
+    stream.append(b"done\n")
+    proc = subprocess.run(["git", "fast-import", "--quiet", "--date-format=now", "--done"], cwd=repo, input=b"".join(stream), capture_output=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"git fast-import failed with return code {proc.returncode}\n{proc.stderr.decode()}")
+    # fast-import only writes objects and refs, bring the index and working tree up to date
+    exec_cmd(["git", "reset", "--hard", "--quiet", checkout_branch], cwd=repo, output="discard")
+
+def fast_import_history(repo: str, branch: str, commits: List[Tuple[str, List[Tuple[str, str]]]]):
+    """
+    Append commits on top of the existing `branch` with a single `git fast-import` process, then check it out.
 
-def create_or_switch_to_branch(repo: str, branch: str):
-    exec_cmd(f"git switch -c {branch} || git switch {branch}", cwd=repo)
+    :param commits: `(commit_msg, [(filename, content), ...])` per commit, oldest first
+    :type commits: List[Tuple[str, List[Tuple[str, str]]]]
+    """
+    _run_fast_import(repo, _fast_import_commits(branch, commits, f"refs/heads/{branch}^0"), branch)
+
+def fast_import_repo(repo: str, content: RepoContent):
+    """
+    Fill a repository created by `create_repo` with `content` using a single `git fast-import` process,
+    one commit per file, other branches are branched off the default branch once it is filled.
+    The default branch is checked out at the end.
+    """
+    default_branch = content.default_branch
+    stream = []
+    for branch in sorted(content.branches, key=lambda b: b.name != default_branch):
+        commits = [(file.commit_msg, [(file.filename, file.content)]) for file in branch.files]
+        if branch.name == default_branch:
+            stream += _fast_import_commits(default_branch, commits, f"refs/heads/{default_branch}^0")
+        elif commits:
+            # the default branch's tip as fast-import knows it, including the commits above
+            stream += _fast_import_commits(branch.name, commits, f"refs/heads/{default_branch}")
+        else:
+            stream.append(f"reset refs/heads/{branch.name}\nfrom refs/heads/{default_branch}\n\n".encode())
+    _run_fast_import(repo, stream, default_branch)
+
+def checked_out_branch(repo: str) -> Optional[str]:
+    """
+    The branch checked out in `repo`, read from its HEAD file instead of asking git.
+    None for a detached HEAD.
+    """
+    git_dir = os.path.join(repo, ".git")
+    if os.path.isfile(git_dir):
+        # submodule checkouts and worktrees point to their git directory
+        with open(git_dir) as f:
+            git_dir = os.path.join(repo, f.read().strip().removeprefix("gitdir: "))
+    with open(os.path.join(git_dir, "HEAD")) as f:
+        head = f.read().strip()
+    return head.removeprefix("ref: refs/heads/") if head.startswith("ref: refs/heads/") else None
 
 def switch_branch(repo: str, branch: str):
-    exec_cmd(f"git switch {branch}", cwd=repo)
+    # switching to the branch that is already checked out doesn't change anything, skip the git process
+    if checked_out_branch(repo) == branch:
+        return
+    exec_cmd(["git", "switch", "--quiet", branch], cwd=repo, output="discard")
 
 def get_commit_hash(repo: str, branch: str) -> str:
-    result: CmdResult = exec_cmd(f"git rev-parse {branch}", cwd=repo)
+    result: CmdResult = exec_cmd(["git", "rev-parse", branch], cwd=repo)
     return result.stdout.strip()
 
 def get_head_branch(repo: str) -> str:
-    result: CmdResult = exec_cmd("git rev-parse --abbrev-ref HEAD", cwd=repo)
+    result: CmdResult = exec_cmd(["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=repo)
     return result.stdout.strip()
 
 def repo_url(repo_path: str) -> str:
@@ -49,11 +129,76 @@ def add_local_submodule(repo_path: str, repo_branch: str, submodule_path: str, p
     """
     switch_branch(repo_path, repo_branch)
     # add the submodule (default branch will be checked out)
-    cmd = f"git submodule add {repo_url(submodule_path)} {path_relative_to_repo}"
-    exec_cmd(cmd, cwd=repo_path)
+    # local submodules are cloned over the file protocol, allow it for this command only
+    exec_cmd(["git", "-c", "protocol.file.allow=always", "submodule", "add", repo_url(submodule_path), path_relative_to_repo], cwd=repo_path, output="discard")
     submodule_dir_in_repo = os.path.join(repo_path, path_relative_to_repo)
     # switch to exact commit hash and stage the change
     switch_branch(submodule_dir_in_repo, branch)
-    exec_cmd("git add .", cwd=repo_path)
+    exec_cmd(["git", "add", "."], cwd=repo_path, output="discard")
     # commit the addition of the submodule at the desired branch/commit
-    exec_cmd(f"git commit -m 'Add local submodule {path_relative_to_repo} branch: {branch}'", cwd=repo_path)
+    exec_cmd(["git", "commit", "-m", f"Add local submodule {path_relative_to_repo} branch: {branch}"], cwd=repo_path, output="discard")
+
+def add_local_submodules_batch(repo_path: str, specs: List[Tuple[str, str, str, str]]):
+    """
+    Same as calling `add_local_submodule` for each of `specs`, but in a single shell invocation.
+    The branch checked out in `repo_path` beforehand is checked out again at the end.
+
+    :param specs: `(repo_branch, submodule_path, path_relative_to_repo, branch)` per submodule registration, see `add_local_submodule`
+    :type specs: List[Tuple[str, str, str, str]]
+    """
+    head = checked_out_branch(repo_path)
+    cmds = []
+    for repo_branch, submodule_path, path_relative_to_repo, branch in specs:
+        cmds.append(["git", "switch", "--quiet", repo_branch])
+        # local submodules are cloned over the file protocol, allow it for this command only
+        cmds.append(["git", "-c", "protocol.file.allow=always", "submodule", "add", "--quiet", repo_url(submodule_path), path_relative_to_repo])
+        cmds.append(["git", "-C", path_relative_to_repo, "switch", "--quiet", branch])
+        cmds.append(["git", "add", "."])
+        cmds.append(["git", "commit", "--quiet", "-m", f"Add local submodule {path_relative_to_repo} branch: {branch}"])
+    cmds.append(["git", "switch", "--quiet", head])
+    run_batch(repo_path, *cmds)
+
+def list_tree(repo: str, ref: str, path: str) -> List[str]:
+    """Names of the entries of directory `path` as committed in `ref`, without checking it out."""
+    result: CmdResult = exec_cmd(["git", "ls-tree", "--name-only", f"{ref}:{path}"], cwd=repo, allow_failure=True)
+    return result.stdout.splitlines()
+
+def get_commit_hashes(repo: str, branches: List[str]) -> Dict[str, str]:
+    """Commit hashes of several branches with a single git process."""
+    refs = [f"refs/heads/{branch}" for branch in branches]
+    result: CmdResult = exec_cmd(["git", "for-each-ref", "--format=%(refname:short) %(objectname)", *refs], cwd=repo)
+    return dict(line.split(" ", 1) for line in result.stdout.splitlines())
+
+class GitBatchReader:
+    """
+    Reads objects of a repository through one long-lived `git cat-file --batch` process,
+    instead of starting a git process per object.
+    """
+    def __init__(self, repo: str):
+        self.proc = subprocess.Popen(["git", "cat-file", "--batch"], cwd=repo, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read(self, rev: str) -> Optional[bytes]:
+        """
+        :param rev: object to read, e.g. `branch:path/to/file`
+        :return: the object contents, or None if it doesn't exist
+        """
+        self.proc.stdin.write(rev.encode() + b"\n")
+        self.proc.stdin.flush()
+        # "<oid> <type> <size>", or "<rev> missing" / "<rev> ambiguous"
+        header = self.proc.stdout.readline().split()
+        if len(header) != 3:
+            return None
+        content = self.proc.stdout.read(int(header[2]))
+        self.proc.stdout.read(1) # the newline that terminates the contents
+        return content
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
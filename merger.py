@@ -3,9 +3,17 @@ from enum import Enum
 import os
 import argparse
 import atexit
-import configparser
+import functools
+import hashlib
+import importlib.machinery
+import importlib.util
+import multiprocessing
+import shutil
+import signal
 import tempfile
-from typing import Dict, List, Mapping, Optional, Set
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Mapping, Optional, Set, Tuple
 from dataclasses import dataclass, field
 import time
 
@@ -20,18 +28,92 @@ import json
 THIS_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 GIT_FILTER_REPO = os.path.join(THIS_SCRIPT_DIR, "git-filter-repo")
 SANDBOX_DIR = os.path.join(THIS_SCRIPT_DIR, "sandbox")
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".monomaker", "cache")
 
 MONOMAKER_PREFIX = "[monomaker]"
 
+# Default number of submodule branches cloned and filtered concurrently (see --jobs)
+DEFAULT_JOBS = min(8, os.cpu_count() or 1)
+
+# Passed to git commands that transfer packs (clone/fetch), so packing and delta resolution use every core
+# (index-pack caps its automatic thread count well below that on large machines)
+GIT_PACK_THREADS_CONFIG = ["-c", f"pack.threads={os.cpu_count() or 1}", "-c", f"index-pack.threads={os.cpu_count() or 1}"]
+
 # Global variables used for logging/reporting
 metarepo_name = "metarepo"
 monorepo_name = "monorepo"
 
-if not os.path.exists(GIT_FILTER_REPO):
-    raise RuntimeError(f"git-filter-repo not found at {GIT_FILTER_REPO}")
+def check_git_filter_repo():
+    """
+    Importing submodules needs git-filter-repo, check for it once before any work
+    (sandbox, clones, metarepo import) is done instead of failing halfway through.
+    """
+    if not os.path.exists(GIT_FILTER_REPO):
+        raise RuntimeError(f"git-filter-repo not found at {GIT_FILTER_REPO}")
+
+def remove_sandbox():
+    """
+    Remove the sandbox directory without spawning a shell.
+    Runs from atexit, where concurrent.futures executors can no longer schedule work, so this stays single-threaded.
+    """
+    if multiprocessing.parent_process() is not None:
+        # worker processes (e.g. the git-filter-repo worker) re-import this module, the sandbox is not theirs to remove
+        return
+    shutil.rmtree(SANDBOX_DIR, ignore_errors=True)
 
 # Ensure sandbox is removed at exit (optional: remove this in debug)
-atexit.register(lambda: os.system(f"rm -rf {SANDBOX_DIR}"))
+atexit.register(remove_sandbox)
+
+def exit_on_signal(signum, frame):
+    """
+    SIGTERM (and SIGHUP) terminate the process without running atexit handlers,
+    turn them into a regular exit so the sandbox is still removed.
+    SIGINT already raises KeyboardInterrupt, which runs them.
+    """
+    print(f"Received signal {signal.Signals(signum).name}, exiting ...")
+    sys.exit(128 + signum)
+
+# git-filter-repo is used as a library inside a pool of long-lived worker processes (created on first use),
+# so the interpreter start-up and script parsing are paid once per worker instead of once per branch.
+# It runs in separate processes because it changes the working directory and may call sys.exit().
+_filter_repo_executor: Optional[ProcessPoolExecutor] = None
+_filter_repo_executor_lock = threading.Lock()
+
+def _load_git_filter_repo():
+    """Import the git-filter-repo script as a module (once per process)."""
+    module = sys.modules.get("git_filter_repo")
+    if module is None:
+        loader = importlib.machinery.SourceFileLoader("git_filter_repo", GIT_FILTER_REPO)
+        spec = importlib.util.spec_from_loader(loader.name, loader)
+        module = importlib.util.module_from_spec(spec)
+        loader.exec_module(module)
+        sys.modules[loader.name] = module
+        module.setup_gettext()
+    return module
+
+def _run_git_filter_repo(repo_dir: str, filter_args: List[str]):
+    """Executed in the git-filter-repo worker process."""
+    gfr = _load_git_filter_repo()
+    os.chdir(repo_dir)
+    try:
+        args = gfr.FilteringOptions.parse_args(filter_args)
+        gfr.RepoFilter(args).run()
+    except SystemExit as e:
+        raise RuntimeError(f"git-filter-repo {' '.join(filter_args)} failed in {repo_dir} with exit code {e.code}")
+    finally:
+        sys.stdout.flush()
+
+def git_filter_repo(repo_dir: str, filter_args: List[str]):
+    """
+    Run git-filter-repo with the given arguments on the repository at repo_dir.
+    """
+    global _filter_repo_executor
+    with _filter_repo_executor_lock:
+        if _filter_repo_executor is None:
+            # workers are spawned on demand, how many runs happen at once is bounded by the callers (see --jobs)
+            _filter_repo_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+    print(f"Running git-filter-repo {' '.join(filter_args)} (cwd={repo_dir})")
+    _filter_repo_executor.submit(_run_git_filter_repo, repo_dir, filter_args).result()
 
 
 @dataclass
@@ -70,14 +152,14 @@ class MonorepoCache:
         # Need to checkout and scan
         current_branch = get_head_branch(self.monorepo_root_dir)
         if current_branch != branch:
-            exec_cmd(f"git checkout --recurse-submodules {branch}", cwd=self.monorepo_root_dir)
+            exec_cmd(["git", "checkout", "--recurse-submodules", branch], cwd=self.monorepo_root_dir, output="inherit")
         
         submodules = get_all_submodules(self.monorepo_root_dir)
         self._submodules_per_branch[branch] = submodules
         self._scanned_branches.add(branch)
         
         # Clean up any uncommitted changes from submodule switching
-        exec_cmd("git submodule update --checkout --force", cwd=self.monorepo_root_dir)
+        exec_cmd(["git", "submodule", "update", "--checkout", "--force"], cwd=self.monorepo_root_dir, output="inherit")
         
         return submodules
 
@@ -96,7 +178,7 @@ class MonorepoCache:
         
         # Restore original branch
         if current_branch is not None and current_branch != get_head_branch(self.monorepo_root_dir):
-            exec_cmd(f"git checkout --recurse-submodules {current_branch}", cwd=self.monorepo_root_dir)
+            exec_cmd(["git", "checkout", "--recurse-submodules", current_branch], cwd=self.monorepo_root_dir, output="inherit")
         
         # Find branches tracking this submodule
         tracking_branches = set()
@@ -120,7 +202,7 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 def get_all_branches(repo_path: str, verbose: bool = False, raw: bool = False) -> List[str]:
-    cmd = "git branch -a"
+    cmd = ["git", "branch", "-a"]
     out = exec_cmd(cmd, cwd=repo_path)
     branches = set()
     if verbose:
@@ -128,22 +210,71 @@ def get_all_branches(repo_path: str, verbose: bool = False, raw: bool = False) -
     if raw:
         return [line.strip() for line in out.stdout.splitlines()]
     for line in out.stdout.splitlines():
-        line = line.strip()
-        if line.startswith("*"):
-            line = line[1:].strip()
-        line = line.strip()
-        if line.find("HEAD") != -1 or line.find("no branch") != -1:
+        line = line.strip().removeprefix("*").lstrip()
+        if "HEAD" in line or "no branch" in line:
             continue
-        if line.startswith("remotes/origin/"):
-            line = line[len("remotes/origin/"):]
-        branches.add(line)
+        branches.add(line.removeprefix("remotes/origin/"))
     return list(branches)
 
+@functools.lru_cache(maxsize=None)
+def get_all_branches_in_origin(repo_url: str) -> Tuple[str, ...]:
+    """
+    Returns the branches of the remote repository at repo_url, without cloning it.
+    The result is cached per url for the rest of the run (see clear_origin_caches()).
+    """
+    out = exec_cmd(["git", "ls-remote", "--heads", repo_url])
+    branches = []
+    for line in out.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].startswith("refs/heads/"):
+            branches.append(parts[1].removeprefix("refs/heads/"))
+    return tuple(branches)
+
+@functools.lru_cache(maxsize=None)
+def get_default_branch_in_origin(repo_url: str) -> Optional[str]:
+    """
+    Returns the default branch (HEAD) of the remote repository at repo_url without cloning it,
+    or None if the remote does not advertise it.
+    The result is cached per url for the rest of the run (see clear_origin_caches()).
+    """
+    out = exec_cmd(["git", "ls-remote", "--symref", repo_url, "HEAD"])
+    for line in out.stdout.splitlines():
+        # ref: refs/heads/main	HEAD
+        if line.startswith("ref: refs/heads/"):
+            return line.removeprefix("ref: refs/heads/").split()[0]
+    return None
+
+def clear_origin_caches():
+    """
+    Forget the cached remote queries, the remotes may have changed since they were queried.
+    """
+    get_all_branches_in_origin.cache_clear()
+    get_default_branch_in_origin.cache_clear()
+
+def ensure_cached_mirror(repo_url: str, cache_dir: str) -> str:
+    """
+    Returns the path of a persistent bare mirror of repo_url under cache_dir.
+    The mirror is cloned on first use, later runs only fetch what changed since.
+    """
+    mirror_dir = os.path.join(cache_dir, f"{hashlib.sha1(repo_url.encode()).hexdigest()}.git")
+    if os.path.isdir(mirror_dir):
+        print(f"Updating cached mirror of {repo_url} at {mirror_dir} ...")
+        exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "fetch", "--prune", "origin"], cwd=mirror_dir, output="inherit")
+    else:
+        print(f"Creating cached mirror of {repo_url} at {mirror_dir} ...")
+        ensure_dir(cache_dir)
+        # clone next to the final location and rename, so an interrupted clone never looks like a valid mirror
+        partial_mirror_dir = f"{mirror_dir}.partial"
+        shutil.rmtree(partial_mirror_dir, ignore_errors=True)
+        exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "clone", "--mirror", repo_url, partial_mirror_dir], output="inherit")
+        os.rename(partial_mirror_dir, mirror_dir)
+    return mirror_dir
+
 def get_head_branch(repo_path: str) -> Optional[str]:
     """
     Returns the default branch of the given repo, or None if it cannot be determined.
     """
-    cmd = "git rev-parse --abbrev-ref HEAD"
+    cmd = ["git", "rev-parse", "--abbrev-ref", "HEAD"]
     out = exec_cmd(cmd, cwd=repo_path)
     default_branch = out.stdout.strip()
     if default_branch == "HEAD" or default_branch.find("no branch") != -1 or default_branch == "":
@@ -151,13 +282,55 @@ def get_head_branch(repo_path: str) -> Optional[str]:
     return default_branch
 
 
+def _parse_gitmodules(gitmodules_path: str) -> List[Tuple[str, str]]:
+    """
+    Returns the (path, url) pairs declared in a .gitmodules file.
+    Not cached: branch checkouts rewrite the file in place, possibly within one mtime tick and at the same size.
+    """
+    # .gitmodules only holds `[submodule "name"]` sections with `key = value` lines, a single pass is enough
+    sections: List[Dict[str, str]] = []
+    current: Optional[Dict[str, str]] = None
+    with open(gitmodules_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line[0] in "#;":
+                continue
+            if line.startswith("["):
+                current = dict() if line.startswith("[submodule ") else None
+                if current is not None:
+                    sections.append(current)
+                continue
+            if current is None or "=" not in line:
+                continue
+            key, _, value = line.partition("=")
+            current[key.strip().lower()] = value.strip().strip('"')
+    entries = []
+    for section in sections:
+        path = section.get("path")
+        if not path:
+            continue
+        url = section.get("url")
+        if not url:
+            continue
+        entries.append((path, url))
+    return entries
+
 def get_all_submodules(repo_path: str) -> List[SubmoduleDef]:
     """
     Returns list of submodule paths in the given repo (at its current HEAD)
     """
-    # retrieve all submodule commit hashes
+    # read .gitmodules file to get the submodule paths and URLs
+    gitmodules_path = os.path.join(repo_path, ".gitmodules")
+    try:
+        gitmodules_entries = _parse_gitmodules(gitmodules_path)
+    except FileNotFoundError:
+        return []
+    if len(gitmodules_entries) == 0:
+        return []
+
+    # retrieve all submodule commit hashes (these depend on HEAD, so they are never cached)
     # git submodule status is not recursive, which is good for us
-    submodule_hashes_raw = exec_cmd("git submodule status", cwd=repo_path, allow_failure=True)
+    submodule_hashes_raw = exec_cmd(["git", "submodule", "status"], cwd=repo_path, allow_failure=True)
     if submodule_hashes_raw.returncode != 0 and submodule_hashes_raw.stderr:
         print(f"Warning: git submodule status failed in repo at {repo_path}, some submodules may be missing. Error: {submodule_hashes_raw.stderr}")
     submodule_hashes = dict()
@@ -172,26 +345,13 @@ def get_all_submodules(repo_path: str) -> List[SubmoduleDef]:
         path = parts[1]
         submodule_hashes[path] = commit_hash
 
-    # read .gitmodules file to get the submodule paths and URLs
-    gitmodules_path = os.path.join(repo_path, ".gitmodules")
-    if not os.path.isfile(gitmodules_path):
-        return []
-    config = configparser.ConfigParser()
-    config.read(gitmodules_path)
     submodules: List[SubmoduleDef] = []
-    for section in config.sections():
-        if section.startswith("submodule "):
-            path = config[section].get("path")
-            if not path:
-                continue
-            url = config[section].get("url")
-            if not url:
-                continue
-            commit_hash = submodule_hashes.get(path, "")
-            if commit_hash == "":
-                print(f"WARNING: Cannot find commit hash for submodule at path {path}, skipping it.")
-            else:
-                submodules.append(SubmoduleDef(path, url, commit_hash))
+    for path, url in gitmodules_entries:
+        commit_hash = submodule_hashes.get(path, "")
+        if commit_hash == "":
+            print(f"WARNING: Cannot find commit hash for submodule at path {path}, skipping it.")
+        else:
+            submodules.append(SubmoduleDef(path, url, commit_hash))
     return submodules
 
 
@@ -199,7 +359,7 @@ def get_head_commit(repo_path: str) -> str:
     """
     Returns the commit hash of the current HEAD in the given repo.
     """
-    cmd = "git rev-parse HEAD"
+    cmd = ["git", "rev-parse", "HEAD"]
     out = exec_cmd(cmd, cwd=repo_path)
     return out.stdout.strip()
 
@@ -214,21 +374,21 @@ def import_meta_repo(monorepo_root_dir: str, metarepo_root_dir: str):
     print(header_string(f"Importing metarepo {metarepo_name} into monorepo {monorepo_name}"))
     metarepo_branches = get_all_branches(metarepo_root_dir)
     print(f"{metarepo_name} branches: {metarepo_branches}")
-    exec_cmd(f"git remote add metarepo {metarepo_root_dir}", cwd=monorepo_root_dir)
-    exec_cmd(f"git fetch metarepo '+refs/heads/*:refs/remotes/metarepo/*'", cwd=monorepo_root_dir)
+    exec_cmd(["git", "remote", "add", "metarepo", metarepo_root_dir], cwd=monorepo_root_dir, output="inherit")
+    exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "fetch", "metarepo", "+refs/heads/*:refs/remotes/metarepo/*"], cwd=monorepo_root_dir, output="inherit")
     
     metarepo_branch_commits = dict()
     num_branches = len(metarepo_branches)
     for idx, branch in enumerate(metarepo_branches):
         print(f"=== [{idx+1}/{num_branches}] Importing {metarepo_name}:{branch} ===")
         # ensure monorepo exists and branch created/overwritten to exactly meta branch
-        exec_cmd(f"git checkout -B {branch} metarepo/{branch}", cwd=monorepo_root_dir)
+        exec_cmd(["git", "checkout", "-B", branch, f"metarepo/{branch}"], cwd=monorepo_root_dir, output="inherit")
         # breadcrumb: commit message to indicate the first bookkeeping commit.
         commit_hash = get_head_commit(monorepo_root_dir)
         metarepo_branch_commits[branch] = commit_hash
-        exec_cmd(f"git commit --allow-empty -m '{MONOMAKER_PREFIX} checkout `{metarepo_name}` branch `{branch}` at commit {commit_hash}'", cwd=monorepo_root_dir)
+        exec_cmd(["git", "commit", "--allow-empty", "-m", f"{MONOMAKER_PREFIX} checkout `{metarepo_name}` branch `{branch}` at commit {commit_hash}"], cwd=monorepo_root_dir, output="inherit")
     # cleanup
-    exec_cmd(f"git remote remove metarepo", cwd=monorepo_root_dir)
+    exec_cmd(["git", "remote", "remove", "metarepo"], cwd=monorepo_root_dir, output="inherit")
     return metarepo_branch_commits
 
 def update_all_repo_branches(repo_root_dir: str):
@@ -240,7 +400,7 @@ def update_all_repo_branches(repo_root_dir: str):
     print(f"Updating all branches in repo at {repo_root_dir}: {branches}")
     
     # Single network call to fetch all branches at once
-    exec_cmd("git fetch --all --prune", cwd=repo_root_dir)
+    exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "fetch", "--all", "--prune"], cwd=repo_root_dir, output="inherit")
     
     # Update local branches to match remote tracking branches (no network calls)
     current_branch = get_head_branch(repo_root_dir)
@@ -249,10 +409,12 @@ def update_all_repo_branches(repo_root_dir: str):
         print(f"=== [{idx+1}/{num_branches}] Updating branch {branch} ===")
         if branch == current_branch:
             # Can't update checked-out branch with `git branch -f`, use reset instead
-            exec_cmd(f"git reset --hard origin/{branch}", cwd=repo_root_dir)
+            exec_cmd(["git", "reset", "--hard", f"origin/{branch}"], cwd=repo_root_dir, output="inherit")
         else:
             # Update branch ref directly without checkout
-            exec_cmd(f"git branch -f {branch} origin/{branch}", cwd=repo_root_dir)
+            exec_cmd(["git", "branch", "-f", branch, f"origin/{branch}"], cwd=repo_root_dir, output="inherit")
+    # refs were just moved, don't serve stale answers for this repo
+    clear_origin_caches()
     return branches
 
 def get_monorepo_branches_tracking_submodule(monorepo_root_dir: str, submodule_path: str, cache: MonorepoCache) -> Set[str]:
@@ -262,13 +424,32 @@ def get_monorepo_branches_tracking_submodule(monorepo_root_dir: str, submodule_p
     """
     return cache.get_branches_tracking_submodule(submodule_path)
 
+def prepare_submodule_branch(info_clone_dir: str, branch: str, branch_clone_dir: str, submodule_path: str) -> Tuple[str, str, List[SubmoduleDef]]:
+    """
+    Clone a single submodule branch into branch_clone_dir and rewrite its history to live under submodule_path.
+    Only touches branch_clone_dir, so it is safe to run concurrently for different branches.
+    Returns (branch_clone_dir, original head commit, nested submodules), the latter two as seen before the rewrite.
+    """
+    # Clone from the local info_clone_dir with `--shared`, so the clone borrows its object store through
+    # `objects/info/alternates` instead of copying or hardlinking it. Only the checkout is written to disk.
+    # git-filter-repo writes the rewritten objects into the clone itself, info_clone_dir is never modified.
+    exec_cmd(["git", "clone", "--shared", "-b", branch, "--single-branch", info_clone_dir, branch_clone_dir], output="inherit")
+    commit_hash = get_head_commit(branch_clone_dir)
+    nested_submodules = get_all_submodules(branch_clone_dir)
+    # Run filter-repo on the isolated clone to move everything under submodule_path
+    git_filter_repo(branch_clone_dir, ["--force", "--to-subdirectory-filter", submodule_path])
+    return branch_clone_dir, commit_hash, nested_submodules
+
 def import_submodule(monorepo_root_dir: str,
                      submodule_repo_url: str,
                      submodule_path: str,
                      metarepo_default_branch: str,
                      metarepo_branch_commits: Mapping[str, str],
                      cache: MonorepoCache,
-                     expected_branches: Optional[Set[str]] = None) -> SubmoduleImportInfo:
+                     expected_branches: Optional[Set[str]] = None,
+                     shallow: bool = False,
+                     cache_dir: Optional[str] = None,
+                     jobs: int = DEFAULT_JOBS) -> SubmoduleImportInfo:
     """
     It is expected that monorepo_root_dir points to a git repository where the submodule will be imported.
     the submodule will be cloned from submodule_repo_url, and all its branches will be imported under submodule_path in the monorepo.
@@ -276,32 +457,25 @@ def import_submodule(monorepo_root_dir: str,
     cache: MonorepoCache to avoid repeated expensive git operations.
 
     metarepo_branches_tracking_submodule: is only used for bookkeeping/reporting purposes, to know which metarepo branches actually tracked this submodule.
+
+    shallow: only import the tip commit of each submodule branch instead of its full history.
+
+    cache_dir: if set, the submodule is fetched through a persistent mirror in this directory (see ensure_cached_mirror()).
+
+    jobs: how many submodule branches are cloned and filtered concurrently.
     """
     global monorepo_name, metarepo_name
     with tempfile.TemporaryDirectory() as tempdir:
-        # First, make a full clone to serve as a local cache for all branches.
-        # This avoids repeated network calls when cloning individual branches later.
-        info_clone_dir = os.path.join(tempdir, "info_clone")
-        print(header_string(f"Cloning submodule {submodule_path} from {submodule_repo_url} to get branch info ..."))
-        exec_cmd(f"git clone {submodule_repo_url} {info_clone_dir}")
-        exec_cmd("git fetch --all --prune", cwd=info_clone_dir)
-
-        # Get the default branch (after cloning, HEAD points to the default branch)
-        submodule_default_branch = get_head_branch(info_clone_dir)
+        # Branch info is queried from the remote directly, the submodule is only cloned if a branch needs importing.
+        print(header_string(f"Querying submodule {submodule_path} branches from {submodule_repo_url} ..."))
+        submodule_default_branch = get_default_branch_in_origin(submodule_repo_url)
         report = SubmoduleImportInfo(submodule_path, submodule_default_branch)
 
-        # Get all branches from the fresh clone
-        submodule_branches = set(get_all_branches(info_clone_dir))
+        submodule_branches = set(get_all_branches_in_origin(submodule_repo_url))
         print(f"Found branches for submodule {submodule_path}: {submodule_branches}")
         if expected_branches is not None and submodule_branches != expected_branches:
             raise RuntimeError(f"Submodule branches mismatch. Expected: {expected_branches}, Found: {submodule_branches}")
         
-        # Create local tracking branches for all remote branches so we can clone from this local repo.
-        # git clone only sees local branches, not remote tracking refs.
-        for branch in submodule_branches:
-            if branch != submodule_default_branch:  # default branch already exists locally
-                exec_cmd(f"git branch {branch} origin/{branch}", cwd=info_clone_dir, allow_failure=True)
-        
         # Process each branch
         branches_dir = os.path.join(tempdir, "branches")
         ensure_dir(branches_dir)
@@ -350,8 +524,8 @@ def import_submodule(monorepo_root_dir: str,
             # need to make sure it was not already created in the monorepo (in a previous submodule import)
             # recurse-submodules is needed because a simple `git switch` does not change the submodule HEADs if they are different between branches
             if branch not in monorepo_branches:
-                exec_cmd(f"git switch --recurse-submodules {metarepo_default_branch}", cwd=monorepo_root_dir)
-                exec_cmd(f"git switch -c {branch}", cwd=monorepo_root_dir)
+                exec_cmd(["git", "switch", "--recurse-submodules", metarepo_default_branch], cwd=monorepo_root_dir, output="inherit")
+                exec_cmd(["git", "switch", "-c", branch], cwd=monorepo_root_dir, output="inherit")
                 print(f"Pre-created {monorepo_name} branch {branch} from {metarepo_name} default branch {metarepo_default_branch}.")
                 # Update monorepo_branches and cache to reflect the newly created branch
                 monorepo_branches.add(branch)
@@ -359,16 +533,21 @@ def import_submodule(monorepo_root_dir: str,
                 branches_closure.add(branch)
         
         # Switch back to default branch after pre-creating branches
-        exec_cmd(f"git switch --recurse-submodules {metarepo_default_branch}", cwd=monorepo_root_dir)
+        exec_cmd(["git", "switch", "--recurse-submodules", metarepo_default_branch], cwd=monorepo_root_dir, output="inherit")
 
-        num_branches = len(branches_closure)
-        for idx, branch in enumerate(branches_closure):
+        # paths that do not depend on the branch being imported
+        submodule_gitmodules_relative_path = os.path.join(submodule_path, ".gitmodules")
+
+        # Work out which submodule branch is imported into each monorepo branch before touching anything.
+        # monorepo branch -> submodule branch to import
+        branches_to_import: Dict[str, str] = {}
+        for branch in branches_closure:
             # for each {metarepo/branch}, if:
             # 1. branch exists in metarepo but doesn't track submodule -> skip importing submodule branch into it
             # 2. branch exists in metarepo, exists in submodule        -> import submodule branch into it (if submodule is tracked in the metarepo branch)
             # 3. branch exists in metarepo, doesn't exist in submodule -> import the submodule's default branch (if needed, see above)
             # 4. branch doesn't exist in metarepo, exists in submodule -> branch out from metarepo's default branch, import the submodule (if needed, see above)
-            
+
             # NOTE: in case 4, it is assumed that the metarepo itself was already imported into the monorepo,
             # so the default branch should exist fully in the monorepo, and it is safe to branch out from it.
 
@@ -385,115 +564,125 @@ def import_submodule(monorepo_root_dir: str,
                     raise RuntimeError(f"Cannot import submodule branch {branch} into {monorepo_name}, as it does not exist in the submodule, and its default branch cannot be determined.")
                 print(f"Branch {branch} does not exist in submodule, using default branch {submodule_default_branch} instead.")
                 branch_to_import = submodule_default_branch
-
-            # anything not tracked by git should be cleaned up here to avoid conflicts
-            # if its not tracked by git, we probably don't want it in the monorepo anyway
-            # this could happen if some submodule was not cleaned up properly in some tracking branch.
-            # switching to this branch and then to another branch would leave uncommitted changes
-            git_status_out = exec_cmd("git status --porcelain", cwd=monorepo_root_dir).stdout.strip()
-            if git_status_out != "":
-                print(f"Warning: cleaning uncommitted changes in {monorepo_name} at {monorepo_root_dir} before importing submodule {submodule_path} branch {branch} ...\n{git_status_out}")
-                exec_cmd("git clean -fdX", cwd=monorepo_root_dir)
-            
-            # prepare monorepo branch
-            # Switch to the branch (it should exist now, either existed in the metarepo or pre-created above)
-            # Verify the branch exists - if not, it's a logic error
-            if branch not in monorepo_branches:
-                raise RuntimeError(f"Logic error: branch {branch} should exist in {monorepo_name} after preparation loop, but it doesn't. monorepo_branches: {monorepo_branches}")
-            print(header_string(f"[{idx+1}/{num_branches}] Importing {submodule_path}:{branch_to_import} to {monorepo_name}:{branch}"))
-            exec_cmd(f"git switch --recurse-submodules {branch}", cwd=monorepo_root_dir)
-
-            # prepare submodule branch clone (isolated workspace, git-filter-repo modifies its git history)
-            # Clone from local info_clone_dir using file:// protocol to avoid network overhead.
-            # info_clone_dir already has all branches fetched, so this is purely local I/O.
-            branch_clone_dir_name = f"clone_{branch_to_import.replace('/', '_')}"
-            branch_clone_dir = os.path.join(branches_dir, branch_clone_dir_name)
-            exec_cmd(f"rm -rf {branch_clone_dir}") # might already exist if multiple metarepo branches point to same submodule branch
-            info_clone_abs = os.path.abspath(info_clone_dir)
-            exec_cmd(f"git clone -b {branch_to_import} --single-branch file://{info_clone_abs} {branch_clone_dir}")
-            submodule_branch_commit_hash = get_head_commit(branch_clone_dir)
-
-            # Record in report
-            # Determine which metarepo branch to use for the commit hash.
-            # If this branch doesn't exist in metarepo (case 4: submodule-only branch),
-            # use the metarepo default branch. We check metarepo_branch_commits directly
-            # because monorepo_branches_tracking_submodule may include pre-created branches
-            # that inherited submodule definitions from metarepo default.
-            metarepo_branch_used = branch
-            if branch not in metarepo_branch_commits:
-                # case 4: submodule feature branch - use metarepo's default branch
-                metarepo_branch_used = metarepo_default_branch
-            
-            # Get the metarepo commit hash from the mapping (captured during import_meta_repo)
-            metarepo_commit_hash = metarepo_branch_commits[metarepo_branch_used]
-            
-            nested_submodules = get_all_submodules(branch_clone_dir)
-            report.add_entry(branch, metarepo_branch_used, metarepo_commit_hash, branch_to_import, submodule_branch_commit_hash, nested_submodules)
-
-            # Run filter-repo on the isolated clone to move everything under submodule_path
-            exec_cmd(f"python3 {GIT_FILTER_REPO} --force --to-subdirectory-filter {submodule_path}", cwd=branch_clone_dir)
-            
-            # need to remove all the files in the monorepo that are under submodule_path
-            submodule_full_path_in_monorepo = os.path.join(monorepo_root_dir, submodule_path)
-            if os.path.exists(submodule_full_path_in_monorepo):
-                print(f"Removing existing files in {monorepo_name} at {submodule_full_path_in_monorepo} ...")
-                exec_cmd(f"git rm -rf {submodule_path}", cwd=monorepo_root_dir)
-                exec_cmd(f"git commit -m '{MONOMAKER_PREFIX} remove submodule `{submodule_path}` from `{monorepo_name}`'", cwd=monorepo_root_dir)
-            else:
-                print(f"No existing files to remove in {monorepo_name} at {submodule_full_path_in_monorepo}.")
-
-            # Add the filtered clone as a temporary remote, and merge its branch into the monorepo branch
-            branch_clone_abs = os.path.abspath(branch_clone_dir)
-            remote_name = f"tmp_{branch.replace('/', '_').replace('-', '_')}"
+            branches_to_import[branch] = branch_to_import
+
+        # Fetch the submodule branches to import into a bare repository, which serves as a local object store for the per-branch clones.
+        # This is the only network transfer for the submodule. Branches that are not imported anywhere (and tags) are not downloaded.
+        # In a bare repository the fetched branches are local branches, so there is no need to create tracking branches.
+        submodule_branches_to_prepare = sorted(set(branches_to_import.values()))
+        info_clone_dir = os.path.join(tempdir, "info_clone") # tempdir is already absolute, the clones below refer to it by path
+        if len(submodule_branches_to_prepare) > 0:
+            print(header_string(f"Fetching {len(submodule_branches_to_prepare)} branches of submodule {submodule_path} from {submodule_repo_url} ..."))
+            exec_cmd(["git", "init", "--bare", "--quiet", info_clone_dir], output="inherit")
+            fetch_source = submodule_repo_url
+            if cache_dir is not None:
+                # the mirror update is the only network transfer, the object store borrows the mirror's objects,
+                # so fetching from it only writes refs
+                fetch_source = ensure_cached_mirror(submodule_repo_url, cache_dir)
+                with open(os.path.join(info_clone_dir, "objects", "info", "alternates"), "w") as f:
+                    f.write(os.path.join(os.path.abspath(fetch_source), "objects") + "\n")
+            refspecs = [f"+refs/heads/{b}:refs/heads/{b}" for b in submodule_branches_to_prepare]
+            fetch_cmd = ["git", *GIT_PACK_THREADS_CONFIG, "fetch", "--no-tags", fetch_source] + refspecs
+            shallow_fetched = False
+            if shallow:
+                # not every server supports shallow fetches (e.g. dumb http), fall back to the full history
+                shallow_fetched = exec_cmd(fetch_cmd + ["--depth=1"], cwd=info_clone_dir, allow_failure=True, output="inherit").returncode == 0
+                if not shallow_fetched:
+                    print(f"Warning: shallow fetch of submodule {submodule_path} failed, fetching full history instead.")
+            if not shallow_fetched:
+                exec_cmd(fetch_cmd, cwd=info_clone_dir, output="inherit")
+
+        # Clone and filter every needed submodule branch concurrently, once per submodule branch (several monorepo branches may import the same one).
+        # Each of these only works inside its own clone, so they are independent of each other and of the monorepo.
+        # The merges into the monorepo below stay serialized, as they share its index and working tree.
+        num_branches = len(branches_to_import)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(submodule_branches_to_prepare), jobs))) as executor:
+            prepared_branches = {
+                branch_to_import: executor.submit(prepare_submodule_branch, info_clone_dir, branch_to_import, os.path.join(branches_dir, f"clone_{clone_idx}"), submodule_path)
+                for clone_idx, branch_to_import in enumerate(submodule_branches_to_prepare)
+            }
+            for idx, (branch, branch_to_import) in enumerate(branches_to_import.items()):
+                branch_clone_dir, submodule_branch_commit_hash, nested_submodules = prepared_branches[branch_to_import].result()
+
+                # anything not tracked by git should be cleaned up here to avoid conflicts
+                # if its not tracked by git, we probably don't want it in the monorepo anyway
+                # this could happen if some submodule was not cleaned up properly in some tracking branch.
+                # switching to this branch and then to another branch would leave uncommitted changes
+                git_status_out = exec_cmd(["git", "status", "--porcelain"], cwd=monorepo_root_dir).stdout.strip()
+                if git_status_out != "":
+                    print(f"Warning: cleaning uncommitted changes in {monorepo_name} at {monorepo_root_dir} before importing submodule {submodule_path} branch {branch} ...\n{git_status_out}")
+                    exec_cmd(["git", "clean", "-fdX"], cwd=monorepo_root_dir, output="inherit")
+
+                # prepare monorepo branch
+                # Switch to the branch (it should exist now, either existed in the metarepo or pre-created above)
+                # Verify the branch exists - if not, it's a logic error
+                if branch not in monorepo_branches:
+                    raise RuntimeError(f"Logic error: branch {branch} should exist in {monorepo_name} after preparation loop, but it doesn't. monorepo_branches: {monorepo_branches}")
+                print(header_string(f"[{idx+1}/{num_branches}] Importing {submodule_path}:{branch_to_import} to {monorepo_name}:{branch}"))
+                exec_cmd(["git", "switch", "--recurse-submodules", branch], cwd=monorepo_root_dir, output="inherit")
+
+                # Record in report
+                # Determine which metarepo branch to use for the commit hash.
+                # If this branch doesn't exist in metarepo (case 4: submodule-only branch),
+                # use the metarepo default branch. We check metarepo_branch_commits directly
+                # because monorepo_branches_tracking_submodule may include pre-created branches
+                # that inherited submodule definitions from metarepo default.
+                metarepo_branch_used = branch
+                if branch not in metarepo_branch_commits:
+                    # case 4: submodule feature branch - use metarepo's default branch
+                    metarepo_branch_used = metarepo_default_branch
             
-            exec_cmd(f"git remote add {remote_name} {branch_clone_abs}", cwd=monorepo_root_dir)
-            exec_cmd(f"git fetch {remote_name}", cwd=monorepo_root_dir)
-            exec_cmd(f"git merge {remote_name}/{branch_to_import} --allow-unrelated-histories -m '{MONOMAKER_PREFIX} merge submodule `{submodule_path}` branch `{branch_to_import}` at commit {submodule_branch_commit_hash}'", cwd=monorepo_root_dir)
+                # Get the metarepo commit hash from the mapping (captured during import_meta_repo)
+                metarepo_commit_hash = metarepo_branch_commits[metarepo_branch_used]
             
-            # Cleanup remote (the clone directory will be cleaned up by tempdir)
-            exec_cmd(f"git remote remove {remote_name}", cwd=monorepo_root_dir)
-
-            # if we found any nested submodules in this submodule, we need to remove `submodule_path/.gitmodules` file from the monorepo
-            # and then register the actual nested submodules in the monorepo
-            for nested_submodule in nested_submodules:
-                nested_submodule_relative_path_in_monorepo = os.path.join(submodule_path, nested_submodule.path)
-                nested_submodule_abs_path = os.path.join(monorepo_root_dir, nested_submodule_relative_path_in_monorepo)
-                print(header_string(f"Registering nested submodule {nested_submodule_relative_path_in_monorepo} in {monorepo_name} branch {branch}"))
-                # remove .gitmodules file if it exists
-                gitmodules_in_monorepo = os.path.join(monorepo_root_dir, submodule_path, ".gitmodules")
-                if os.path.isfile(gitmodules_in_monorepo): # if we have more than one nested submodule in the same subdirectory, we only need to remove it once
-                    print(f"Removing .gitmodules file for nested submodules at {gitmodules_in_monorepo} ...")
-                    exec_cmd(f"git rm {os.path.join(submodule_path, '.gitmodules')}", cwd=monorepo_root_dir)
-                    exec_cmd(f"git commit -m '{MONOMAKER_PREFIX} remove .gitmodules in `{submodule_path}`'", cwd=monorepo_root_dir)
-                # remove nested submodule entry from subdirectory
-                nested_submodule_exists = os.path.exists(nested_submodule_abs_path)
-                if nested_submodule_exists:
-                    print(f"Removing nested submodule files at {nested_submodule_abs_path} ...")
-                    exec_cmd(f"git rm -rf {nested_submodule_relative_path_in_monorepo}", cwd=monorepo_root_dir)
-                    exec_cmd(f"git commit -m '{MONOMAKER_PREFIX} remove submodule `{nested_submodule.path}` from `{submodule_path}`'", cwd=monorepo_root_dir)
-                # re-register nested submodule in monorepo
-                # `--force` is needed in case multiple branches contain the same nested submodule (likely)
-                commit_hash = nested_submodule.commit_hash
-                exec_cmd(f"git submodule add --force {nested_submodule.url} {nested_submodule_relative_path_in_monorepo}", cwd=monorepo_root_dir)
-                submodule_checkout_success = exec_cmd(f"git checkout {commit_hash}", cwd=nested_submodule_abs_path, allow_failure=True)
-                if submodule_checkout_success.returncode != 0:
-                    # grab actual commit hash from the submodule clone
-                    new_commit_hash = get_head_commit(nested_submodule_abs_path)
-                    print(f"Warning: cannot checkout commit {commit_hash} in nested submodule {nested_submodule_relative_path_in_monorepo}, using {new_commit_hash} instead.")
-                    commit_hash = new_commit_hash
-                else:
-                    # git does not auto-stage the submodule checkout, so we need to do it manually
-                    exec_cmd(f"git add {nested_submodule_relative_path_in_monorepo}", cwd=monorepo_root_dir)
-                exec_cmd(f"git commit -m '{MONOMAKER_PREFIX} add submodule `{nested_submodule_relative_path_in_monorepo}` at commit {commit_hash}'", cwd=monorepo_root_dir)
-                # verify monorepo state is clean (nothing to commit, nothing staged)
-                status_out = exec_cmd("git status --porcelain", cwd=monorepo_root_dir).stdout.strip()
-                if status_out != "":
-                    print(f"Warning: After adding nested submodule {nested_submodule_relative_path_in_monorepo}, {monorepo_name} repo is not clean:\n{status_out}")
-                    # raise RuntimeError(f"After adding nested submodule {nested_submodule_relative_path_in_monorepo}, {monorepo_name} repo is not clean:\n{status_out}")
-                # after submodule is commited, verify it's commit hash with `git ls-tree`
-                ls_tree_out = exec_cmd(f"git ls-tree HEAD {nested_submodule_relative_path_in_monorepo}", cwd=monorepo_root_dir).stdout.strip().split()
-                if len(ls_tree_out) < 3 or ls_tree_out[2] != commit_hash:
-                    raise RuntimeError(f"After adding nested submodule {nested_submodule_relative_path_in_monorepo}, its commit hash in {monorepo_name} does not match expected {commit_hash}, got: {ls_tree_out}")
+                report.add_entry(branch, metarepo_branch_used, metarepo_commit_hash, branch_to_import, submodule_branch_commit_hash, nested_submodules)
+
+                # Fetch the filtered branch anonymously into FETCH_HEAD (local transfer, no remote or temporary ref to clean up)
+                import_ref = "FETCH_HEAD"
+                exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "fetch", "--no-tags", "--quiet", branch_clone_dir, branch_to_import], cwd=monorepo_root_dir, output="inherit")
+
+                # Record the merge without touching the tree (`-s ours`), then replace whatever is under submodule_path
+                # (the submodule gitlink, or a previous import) with the filtered subtree, and commit once.
+                # This avoids a separate "remove submodule" commit per branch.
+                exec_cmd(["git", "merge", "-s", "ours", "--no-commit", "--allow-unrelated-histories", import_ref], cwd=monorepo_root_dir, output="inherit")
+                print(f"Replacing existing files in {monorepo_name} at {submodule_path} (if any) ...")
+                exec_cmd(["git", "rm", "-rfq", "--ignore-unmatch", submodule_path], cwd=monorepo_root_dir, output="inherit")
+                exec_cmd(["git", "read-tree", f"--prefix={submodule_path}/", "-u", f"{import_ref}:{submodule_path}"], cwd=monorepo_root_dir, output="inherit")
+                # nested submodules are re-registered below relative to the monorepo root, so the submodule's own `.gitmodules`
+                # and the nested gitlinks are dropped from the imported subtree in the same commit (one `git rm` for all of them)
+                nested_submodule_paths = [os.path.join(submodule_path, nested_submodule.path) for nested_submodule in nested_submodules]
+                if len(nested_submodules) > 0:
+                    print(f"Removing .gitmodules file and nested submodule entries at {submodule_path} ...")
+                    exec_cmd(["git", "rm", "-rfq", "--ignore-unmatch", submodule_gitmodules_relative_path] + nested_submodule_paths, cwd=monorepo_root_dir, output="inherit")
+                exec_cmd(["git", "commit", "-m", f"{MONOMAKER_PREFIX} merge submodule `{submodule_path}` branch `{branch_to_import}` at commit {submodule_branch_commit_hash}"], cwd=monorepo_root_dir, output="inherit")
+
+                # if we found any nested submodules in this submodule, register the actual nested submodules in the monorepo
+                for nested_submodule, nested_submodule_relative_path_in_monorepo in zip(nested_submodules, nested_submodule_paths):
+                    nested_submodule_abs_path = os.path.join(monorepo_root_dir, nested_submodule_relative_path_in_monorepo)
+                    print(header_string(f"Registering nested submodule {nested_submodule_relative_path_in_monorepo} in {monorepo_name} branch {branch}"))
+                    # re-register nested submodule in monorepo
+                    # `--force` is needed in case multiple branches contain the same nested submodule (likely)
+                    commit_hash = nested_submodule.commit_hash
+                    exec_cmd(["git", "submodule", "add", "--force", nested_submodule.url, nested_submodule_relative_path_in_monorepo], cwd=monorepo_root_dir, output="inherit")
+                    submodule_checkout_success = exec_cmd(["git", "checkout", commit_hash], cwd=nested_submodule_abs_path, allow_failure=True, output="inherit")
+                    if submodule_checkout_success.returncode != 0:
+                        # grab actual commit hash from the submodule clone
+                        new_commit_hash = get_head_commit(nested_submodule_abs_path)
+                        print(f"Warning: cannot checkout commit {commit_hash} in nested submodule {nested_submodule_relative_path_in_monorepo}, using {new_commit_hash} instead.")
+                        commit_hash = new_commit_hash
+                    else:
+                        # git does not auto-stage the submodule checkout, so we need to do it manually
+                        exec_cmd(["git", "add", nested_submodule_relative_path_in_monorepo], cwd=monorepo_root_dir, output="inherit")
+                    exec_cmd(["git", "commit", "-m", f"{MONOMAKER_PREFIX} add submodule `{nested_submodule_relative_path_in_monorepo}` at commit {commit_hash}"], cwd=monorepo_root_dir, output="inherit")
+                    # verify monorepo state is clean (nothing to commit, nothing staged)
+                    status_out = exec_cmd(["git", "status", "--porcelain"], cwd=monorepo_root_dir).stdout.strip()
+                    if status_out != "":
+                        print(f"Warning: After adding nested submodule {nested_submodule_relative_path_in_monorepo}, {monorepo_name} repo is not clean:\n{status_out}")
+                        # raise RuntimeError(f"After adding nested submodule {nested_submodule_relative_path_in_monorepo}, {monorepo_name} repo is not clean:\n{status_out}")
+                    # after submodule is commited, verify it's commit hash with `git ls-tree`
+                    ls_tree_out = exec_cmd(["git", "ls-tree", "HEAD", nested_submodule_relative_path_in_monorepo], cwd=monorepo_root_dir).stdout.strip().split()
+                    if len(ls_tree_out) < 3 or ls_tree_out[2] != commit_hash:
+                        raise RuntimeError(f"After adding nested submodule {nested_submodule_relative_path_in_monorepo}, its commit hash in {monorepo_name} does not match expected {commit_hash}, got: {ls_tree_out}")
         return report
 
 def get_metarepo_submodules(repo_path: str) -> Set[SubmoduleDef]:
@@ -506,7 +695,7 @@ def get_metarepo_submodules(repo_path: str) -> Set[SubmoduleDef]:
     print(header_string("Scanning metarepo for submodules"))
     for branch in branches:
         print(f"--- Scanning branch {branch} for submodules ---")
-        exec_cmd(f"git checkout {branch}", cwd=repo_path)
+        exec_cmd(["git", "checkout", branch], cwd=repo_path, output="inherit")
         submodules_in_branch = get_all_submodules(repo_path)
         result.update(set(submodules_in_branch))
     return result
@@ -518,6 +707,9 @@ class WorkspaceMetadata:
     metarepo_default_branch: str
     dump_template: bool = False
     template_path: Optional[str] = None
+    shallow: bool = False
+    cache_dir: Optional[str] = None
+    jobs: int = DEFAULT_JOBS
 
 def extract_repo_name_from_url(repo_url: str, default: str) -> str:
     default_is_bad = default is None or len(default) == 0
@@ -532,7 +724,7 @@ def extract_repo_name_from_url(repo_url: str, default: str) -> str:
         return default
     return extracted
 
-def prepare_workspace(metarepo_url: str, monorepo_url: Optional[str] = None):
+def prepare_workspace(metarepo_url: str, monorepo_url: Optional[str] = None, cache_dir: Optional[str] = None):
     global metarepo_name, monorepo_name
     metarepo_name = extract_repo_name_from_url(metarepo_url, "metarepo")
     monorepo_name = extract_repo_name_from_url(monorepo_url, "monorepo") if monorepo_url else "monorepo"
@@ -541,18 +733,24 @@ def prepare_workspace(metarepo_url: str, monorepo_url: Optional[str] = None):
 
     # prepare metarepo
     metarepo_root_dir = os.path.join(SANDBOX_DIR, metarepo_name)
-    exec_cmd(f"git clone {metarepo_url} {metarepo_name}", cwd=SANDBOX_DIR)
+    # the sandbox is temporary, so the metarepo clone can keep borrowing objects from the cache
+    reference_args = [] if cache_dir is None else ["--reference-if-able", ensure_cached_mirror(metarepo_url, cache_dir)]
+    exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "clone"] + reference_args + [metarepo_url, metarepo_name], cwd=SANDBOX_DIR, output="inherit")
 
     # Prepare monorepo
     monorepo_root_dir = os.path.join(THIS_SCRIPT_DIR, monorepo_name) # TODO: allow user to choose where to create it on disk
     if monorepo_url:
-        exec_cmd(f"git clone {monorepo_url} {monorepo_name}", cwd=THIS_SCRIPT_DIR)
+        # the monorepo outlives this run, so it must not depend on the cache (--dissociate)
+        reference_args = [] if cache_dir is None else ["--reference-if-able", ensure_cached_mirror(monorepo_url, cache_dir), "--dissociate"]
+        exec_cmd(["git", *GIT_PACK_THREADS_CONFIG, "clone"] + reference_args + [monorepo_url, monorepo_name], cwd=THIS_SCRIPT_DIR, output="inherit")
     else:
         ensure_dir(monorepo_root_dir)
-        if os.listdir(monorepo_root_dir):
+        with os.scandir(monorepo_root_dir) as it:
+            monorepo_dir_is_empty = next(it, None) is None # stop at the first entry instead of listing the directory
+        if not monorepo_dir_is_empty:
             raise RuntimeError(f"Cannot create new empty monorepo at {monorepo_root_dir}, directory is not empty.")
         print(f"Creating a new empty repository at {monorepo_root_dir} ...")
-        exec_cmd("git init --initial-branch=main", cwd=monorepo_root_dir, verbose_output=True)
+        exec_cmd(["git", "init", "--initial-branch=main"], cwd=monorepo_root_dir, verbose_output=True)
 
     # Determine metarepo default branch (after cloning, HEAD points to the default branch)
     metarepo_default_branch = get_head_branch(metarepo_root_dir)
@@ -567,6 +765,7 @@ def prepare_workspace(metarepo_url: str, monorepo_url: Optional[str] = None):
         monorepo_root_dir=monorepo_root_dir,
         metarepo_root_dir=metarepo_root_dir,
         metarepo_default_branch=metarepo_default_branch,
+        cache_dir=cache_dir,
     )
 
 @dataclass
@@ -583,9 +782,16 @@ def main_flow(params: WorkspaceMetadata) -> MigrationImportInfo:
     metarepo_root_dir = params.metarepo_root_dir
     metarepo_default_branch = params.metarepo_default_branch
 
+    if not params.dump_template:
+        # dumping the template doesn't import submodules
+        check_git_filter_repo()
+
     global monorepo_name, metarepo_name
     report = MigrationImportInfo(metarepo_default_branch, metarepo_name, monorepo_name)
 
+    # remote branch queries are only cached within a single migration
+    clear_origin_caches()
+
     # Import metarepo and get the mapping of branch names to their commit hashes
     metarepo_branch_commits = import_meta_repo(monorepo_root_dir, metarepo_root_dir)
 
@@ -601,10 +807,9 @@ def main_flow(params: WorkspaceMetadata) -> MigrationImportInfo:
                 "url": submodule.url,
                 "consume_branches": True
             }
-        template_json = json.dumps(output, indent=4)
         template_path = params.template_path if params.template_path is not None else os.path.join(os.getcwd(), "migration_strategy.json")
         with open(template_path, "w") as f:
-            f.write(template_json)
+            json.dump(output, f, indent=4)
         print(f"Dumped migration strategy template to {template_path}. Exiting.")
         sys.exit(0)
 
@@ -612,8 +817,7 @@ def main_flow(params: WorkspaceMetadata) -> MigrationImportInfo:
     if params.template_path is not None:
         print(f"Loading migration strategy from {params.template_path} ...")
         with open(params.template_path, "r") as f:
-            strategy_json = f.read()
-        strategy_dict: dict = json.loads(strategy_json)
+            strategy_dict: dict = json.load(f)
         for submodule_path, entry_dict in strategy_dict.items():
             migration_strategy.submodule_strategies[submodule_path] = MigrationStrategyEntry(
                 url=entry_dict["url"],
@@ -634,13 +838,21 @@ def main_flow(params: WorkspaceMetadata) -> MigrationImportInfo:
     
     # Create cache for monorepo operations to avoid repeated expensive git calls
     monorepo_cache = MonorepoCache(monorepo_root_dir)
+
+    # Query every submodule remote up front and concurrently (network round-trips),
+    # import_submodule() then gets the cached answers.
+    submodule_urls = sorted({submodule.url for submodule in metarepo_tracked_submodules if should_consume_submodule_branches(submodule)})
+    with ThreadPoolExecutor(max_workers=max(1, min(32, 2 * len(submodule_urls)))) as executor:
+        remote_queries = [executor.submit(query, url) for url in submodule_urls for query in (get_all_branches_in_origin, get_default_branch_in_origin)]
+        for query in remote_queries:
+            query.result()
     
     # for each submodule, we will do a fresh clone, and then process it
     for submodule in metarepo_tracked_submodules:
         if not should_consume_submodule_branches(submodule):
             print(f"Skipping import of submodule {submodule.path} as per migration strategy.")
             continue
-        submodule_report = import_submodule(monorepo_root_dir, submodule.url, submodule.path, metarepo_default_branch, metarepo_branch_commits, monorepo_cache)
+        submodule_report = import_submodule(monorepo_root_dir, submodule.url, submodule.path, metarepo_default_branch, metarepo_branch_commits, monorepo_cache, shallow=params.shallow, cache_dir=params.cache_dir, jobs=params.jobs)
         report.add_submodule_entry(submodule.path, submodule_report)
 
     # after all submodules are imported, we can iterate the branches and squash the bookkeeping commits.
@@ -649,7 +861,7 @@ def main_flow(params: WorkspaceMetadata) -> MigrationImportInfo:
     migration_report = MigrationReport(report)
     # JSON for machine-readable report
     with open(os.path.join(THIS_SCRIPT_DIR, "migration_report.json"), "w") as f:
-        f.write(json.dumps(migration_report.as_dict(), indent=4))
+        json.dump(migration_report.as_dict(), f, indent=4)
     # Human-readable report
     with open(os.path.join(THIS_SCRIPT_DIR, "migration_report.txt"), "w") as f:
         f.write(str(migration_report))
@@ -724,13 +936,13 @@ def check_squashable(working_directory: str) -> SquashableResult:
     
     for number, branch in enumerate(branches):
         # need to clean up local changes before running check out to avoid conflicts
-        exec_cmd("git clean -fdx", cwd=working_directory, verbose=False)
-        exec_cmd("git reset --hard", cwd=working_directory, verbose=False)
-        exec_cmd(f"git checkout {branch}", cwd=working_directory, verbose=False)
+        exec_cmd(["git", "clean", "-fdx"], cwd=working_directory, verbose=False, output="inherit")
+        exec_cmd(["git", "reset", "--hard"], cwd=working_directory, verbose=False, output="inherit")
+        exec_cmd(["git", "checkout", branch], cwd=working_directory, verbose=False, output="inherit")
         state = State.NOT_FOUND
         
         # git log: newest first (HEAD at index 0, oldest at end)
-        commit_log = exec_cmd("git log --pretty=format:'%H %s'", cwd=working_directory, verbose=False).stdout.strip().splitlines()
+        commit_log = exec_cmd(["git", "log", "--pretty=format:%H %s"], cwd=working_directory, verbose=False).stdout.strip().splitlines()
         
         if not commit_log:
             print(f"[{number+1}/{num_branches}] Branch {branch} has no commits, skipping.")
@@ -773,7 +985,7 @@ def check_squashable(working_directory: str) -> SquashableResult:
             print(f"[{number+1}/{num_branches}] Branch {branch} is NOT squashable.")
     
     # finalize
-    exec_cmd(f"git checkout {current_branch}", cwd=working_directory)
+    exec_cmd(["git", "checkout", current_branch], cwd=working_directory, output="inherit")
     return result
 
 
@@ -789,14 +1001,14 @@ def squash_commits(head: str, tail: str, title: str, description: str = "", cwd:
         cwd: Working directory for git commands
     """
     # sanity check: ensure contiguity
-    cmd = f"git rev-list --reverse --first-parent --ancestry-path {tail}^..{head}"
+    cmd = ["git", "rev-list", "--reverse", "--first-parent", "--ancestry-path", f"{tail}^..{head}"]
     rev_list = exec_cmd(cmd, cwd=cwd).stdout.strip().splitlines()
     if rev_list[0] != tail or rev_list[-1] != head:
         raise RuntimeError("Commit range is not contiguous")
 
     # collect original messages
     # old_messages = exec_cmd(f"git log --format='- %s%b' {tail}^..{head}", cwd=cwd).stdout.strip()
-    old_messages = exec_cmd(f"git log --format='%s%b' --reverse --first-parent --ancestry-path {tail}^..{head}", cwd=cwd).stdout.strip()
+    old_messages = exec_cmd(["git", "log", "--format=%s%b", "--reverse", "--first-parent", "--ancestry-path", f"{tail}^..{head}"], cwd=cwd).stdout.strip()
     
     commit_msg = f"""{title}
 {description}
@@ -816,8 +1028,8 @@ Original commit messages:
         f.write(commit_msg)
 
     # squash
-    exec_cmd(f"git reset --soft {tail}^", cwd=cwd)
-    exec_cmd(f'git commit -F "{msg_file}"', cwd=cwd)
+    exec_cmd(["git", "reset", "--soft", f"{tail}^"], cwd=cwd, output="inherit")
+    exec_cmd(["git", "commit", "-F", str(msg_file)], cwd=cwd, output="inherit")
 
     msg_file.unlink()
 
@@ -837,9 +1049,9 @@ def squash_monomaker_commits(working_directory: str):
     current_branch = get_head_branch(working_directory)
     for number, (branch, commit_range) in enumerate(squashable_result.commit_ranges.items()):
         print(f"[{number+1}/{num_branches}] Squashing monomaker commits in branch {branch} ...")
-        exec_cmd("git clean -fdx && git reset --hard", cwd=working_directory, verbose=False)
-        exec_cmd("", cwd=working_directory, verbose=False)
-        exec_cmd(f"git checkout {branch}", cwd=working_directory, verbose=False)
+        exec_cmd(["git", "clean", "-fdx"], cwd=working_directory, verbose=False, output="inherit")
+        exec_cmd(["git", "reset", "--hard"], cwd=working_directory, verbose=False, output="inherit")
+        exec_cmd(["git", "checkout", branch], cwd=working_directory, verbose=False, output="inherit")
         squash_commits(
             head=commit_range.head,
             tail=commit_range.tail,
@@ -847,8 +1059,9 @@ def squash_monomaker_commits(working_directory: str):
             cwd=working_directory
         )
     # finalize
-    exec_cmd(f"git clean -fdx && git reset --hard", cwd=working_directory, verbose=False)
-    exec_cmd(f"git checkout {current_branch}", cwd=working_directory, verbose=False)
+    exec_cmd(["git", "clean", "-fdx"], cwd=working_directory, verbose=False, output="inherit")
+    exec_cmd(["git", "reset", "--hard"], cwd=working_directory, verbose=False, output="inherit")
+    exec_cmd(["git", "checkout", current_branch], cwd=working_directory, verbose=False, output="inherit")
 
 
 # ---------- CLI ----------
@@ -888,6 +1101,32 @@ def main():
         default=None,
         help="Path to save the strategy template file. If not provided, defaults to the current directory."
     )
+    parser.add_argument(
+        "--shallow",
+        dest="shallow",
+        action="store_true",
+        help="If set, only the tip commit of each submodule branch is imported instead of its full history."
+    )
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        action="store_true",
+        help=f"If set, keeps persistent mirrors of all cloned repositories in {DEFAULT_CACHE_DIR}, so re-runs only fetch new objects."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        type=str,
+        default=None,
+        help="Same as --cache, but keeps the mirrors in this directory instead."
+    )
+    parser.add_argument(
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f"Number of submodule branches to clone and rewrite concurrently (default: {DEFAULT_JOBS})."
+    )
     parser.add_argument(
         "--check-squashable",
         dest="check_squashable",
@@ -901,6 +1140,9 @@ def main():
         help="If set, squashes all monomaker commits in the monorepo after migration."
     )
     args = parser.parse_args()
+    signal.signal(signal.SIGTERM, exit_on_signal)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, exit_on_signal)
     if args.dump_log:
         # redirect stdout to a file
         log_txt_path = os.path.join(THIS_SCRIPT_DIR, "migration_log.txt")
@@ -918,9 +1160,15 @@ def main():
         sys.exit(0)
     
     print("start time:", time.ctime())
-    workspace_params = prepare_workspace(args.metarepo_url, args.monorepo_url)
+    if not args.dump_template:
+        # before prepare_workspace() sets up the sandbox and clones
+        check_git_filter_repo()
+    cache_dir = args.cache_dir if args.cache_dir is not None else (DEFAULT_CACHE_DIR if args.cache else None)
+    workspace_params = prepare_workspace(args.metarepo_url, args.monorepo_url, cache_dir)
     workspace_params.dump_template = args.dump_template
     workspace_params.template_path = args.template_path
+    workspace_params.shallow = args.shallow
+    workspace_params.jobs = args.jobs
     migration_report = main_flow(workspace_params)
     end_time = time.monotonic()
     elapsed = end_time - start_time
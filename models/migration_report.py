@@ -1,11 +1,14 @@
-import os
-import copy
+import io
+import logging
+from collections import Counter
 
-from typing import List, Mapping, Optional, NewType
-from dataclasses import dataclass, astuple, asdict
+from typing import FrozenSet, List, Mapping, Optional, NewType, Tuple
+from dataclasses import dataclass
 
 from .repository import SubmoduleDef
 
+logger = logging.getLogger(__name__)
+
 
 # SubmoduleImportInfoEntry, SubmoduleImportInfo, MigrationImportInfo
 # represent data accumulated during migration for reporting purposes.
@@ -19,21 +22,33 @@ class SubmoduleImportInfoEntry:
     submodule_branch: str # what branch was used to import the submodule files
     submodule_commit_hash: str # commit hash of the submodule branch that was imported
     submodule_nested_submodules: List[SubmoduleDef] # nested submodules in this submodule branch
+
+    @property
+    def nested_multiset(self) -> FrozenSet[Tuple[SubmoduleDef, int]]:
+        """nested submodules as a hashable multiset, their order is not significant"""
+        return frozenset(Counter(self.submodule_nested_submodules).items())
+
+    @property
+    def comparison_key(self) -> Tuple[str, str, str, FrozenSet[Tuple[SubmoduleDef, int]]]:
+        """the fields that take part in equality, hashable so entries can be compared as sets"""
+        return (self.monorepo_branch, self.metarepo_branch, self.submodule_commit_hash, self.nested_multiset)
+
+    @property
+    def sort_key(self) -> Tuple[str, str, str, str, str]:
+        """the scalar fields entries are ordered by"""
+        return (self.monorepo_branch, self.metarepo_branch, self.metarepo_commit_hash, self.submodule_branch, self.submodule_commit_hash)
     
     def __eq__(self, other):
         if not isinstance(other, SubmoduleImportInfoEntry):
-            print("Other is not SubmoduleImportInfoEntry")
+            logger.debug("Other is not SubmoduleImportInfoEntry")
             return False
-        return (self.monorepo_branch == other.monorepo_branch and
-                self.metarepo_branch == other.metarepo_branch and
-                self.submodule_commit_hash == other.submodule_commit_hash and
-                sorted(self.submodule_nested_submodules) == sorted(other.submodule_nested_submodules))
+        return self.comparison_key == other.comparison_key
     
     def __str__(self):
         return f"SubmoduleImportInfoEntry(monorepo_branch={self.monorepo_branch}, metarepo_branch={self.metarepo_branch}, submodule_branch={self.submodule_branch}, submodule_commit_hash={self.submodule_commit_hash}, nested_submodules={self.submodule_nested_submodules})"
     
     def __lt__(self, other):
-        return astuple(self) < astuple(other)
+        return self.sort_key < other.sort_key
 
 
 class SubmoduleImportInfo:
@@ -50,32 +65,30 @@ class SubmoduleImportInfo:
         self.entries.append(SubmoduleImportInfoEntry(monorepo_branch, metarepo_branch, metarepo_commit_hash, submodule_branch, submodule_commit_hash, nested_submodules or []))
     
     def __str__(self):
-        s = f"Submodule Import Info for {self.submodule_relative_path}:\n"
-
+        parts = [f"Submodule Import Info for {self.submodule_relative_path}:\n"]
         for entry in self.entries:
-            s += f"  - {entry.monorepo_branch}: metarepo branch: {entry.metarepo_branch} (commit: {entry.metarepo_commit_hash}), submodule branch: {entry.submodule_branch} (commit: {entry.submodule_commit_hash})\n"
-            s += f"    - nested submodules:\n" if len(entry.submodule_nested_submodules) > 0 else ""
-            for nested in entry.submodule_nested_submodules:
-                s += f"    path: {nested.path}, url: {nested.url}, commit: {nested.commit_hash}\n"
-        return s
+            parts.append(f"  - {entry.monorepo_branch}: metarepo branch: {entry.metarepo_branch} (commit: {entry.metarepo_commit_hash}), submodule branch: {entry.submodule_branch} (commit: {entry.submodule_commit_hash})\n")
+            if entry.submodule_nested_submodules:
+                parts.append("    - nested submodules:\n")
+                parts.extend(f"    path: {nested.path}, url: {nested.url}, commit: {nested.commit_hash}\n" for nested in entry.submodule_nested_submodules)
+        return "".join(parts)
     
     def __eq__(self, other):
         if not isinstance(other, SubmoduleImportInfo):
-            print("Other is not SubmoduleImportInfo")
+            logger.debug("Other is not SubmoduleImportInfo")
             return False
         if self.submodule_relative_path != other.submodule_relative_path:
-            print(f"Submodule paths differ: {self.submodule_relative_path} != {other.submodule_relative_path}")
+            logger.debug("Submodule paths differ: %s != %s", self.submodule_relative_path, other.submodule_relative_path)
             return False
         if len(self.entries) != len(other.entries):
-            print(f"Number of entries differ: {len(self.entries)} != {len(other.entries)}")
+            logger.debug("Number of entries differ: %d != %d", len(self.entries), len(other.entries))
+            return False
+        # the order of entries is not significant, but how often each one occurs is
+        self_keys = Counter(e.comparison_key for e in self.entries)
+        other_keys = Counter(e.comparison_key for e in other.entries)
+        if self_keys != other_keys:
+            logger.debug("Entries differ:\n%s\n%s", self_keys - other_keys, other_keys - self_keys)
             return False
-        # sort each list prior to comparison
-        self.entries.sort()
-        other.entries.sort()
-        for e1, e2 in zip(self.entries, other.entries):
-            if e1 != e2:
-                print(f"Entries differ:\n{e1}\n{e2}")
-                return False
         return True
 
 
@@ -95,44 +108,44 @@ class MigrationImportInfo:
         self.submodules_info[submodule_relative_path] = info
     
     def __str__(self):
-        s = "Migration Report:\n"
-        for _, info in self.submodules_info.items():
-            s += str(info) + "\n"
-        return s
+        parts = ["Migration Report:\n"]
+        parts.extend(f"{info}\n" for info in self.submodules_info.values())
+        return "".join(parts)
     
     def __eq__(self, other):
         if not isinstance(other, MigrationImportInfo):
-            print("Other is not MigrationImportInfo")
+            logger.debug("Other is not MigrationImportInfo")
             return False
-        if set(self.submodules_info.keys()) != set(other.submodules_info.keys()):
-            print(f"Submodule keys differ: {set(self.submodules_info.keys())} != {set(other.submodules_info.keys())}")
+        if self.submodules_info.keys() != other.submodules_info.keys():
+            logger.debug("Submodule keys differ: %s != %s", set(self.submodules_info.keys()), set(other.submodules_info.keys()))
             return False
-        for key in self.submodules_info.keys():
-            if self.submodules_info[key] != other.submodules_info[key]:
-                print(f"Submodule info for {key} differs")
+        other_submodules_info = other.submodules_info
+        for key, info in self.submodules_info.items():
+            if info != other_submodules_info[key]:
+                logger.debug("Submodule info for %s differs", key)
                 return False
         return True
 
 RelativePath = NewType('RelativePath', str)
 BranchName = NewType('BranchName', str)
 
-@dataclass
+@dataclass(slots=True)
 class SubmoduleTrackingInfo:
     url: str
     commit_hash: str
 
     def as_dict(self):
-        return asdict(self)
+        return {"url": self.url, "commit_hash": self.commit_hash}
 
-@dataclass
+@dataclass(slots=True)
 class ImportedSubmoduleInfo:
     branch: str
     commit_hash: str
 
     def as_dict(self):
-        return asdict(self)
+        return {"branch": self.branch, "commit_hash": self.commit_hash}
 
-@dataclass
+@dataclass(slots=True)
 class MigrationReportEntry:
     """
     Represents the migration report in a structured format, 
@@ -153,101 +166,117 @@ class MigrationReportEntry:
         }
 
 class MigrationReport:
-    monorepo_branches: Mapping[BranchName, MigrationReportEntry] = dict()
+    monorepo_branches: Mapping[BranchName, MigrationReportEntry]
     metarepo_name: str
     monorepo_name: str
 
     # TODO: reduce code duplication with register_submodule_from_metarepo_branch 
     def register_submodule_import(self, monorepo_branch: str, metarepo_branch: str, metarepo_commit_hash: str, submodule_relative_path: str, submodule_branch: str, submodule_commit_hash: str, nested_submodules: List[SubmoduleDef]):
-        if not monorepo_branch in self.monorepo_branches:
-            self.monorepo_branches[monorepo_branch] = MigrationReportEntry(
+        entry = self.monorepo_branches.get(monorepo_branch)
+        if entry is None:
+            entry = MigrationReportEntry(
                 metarepo_branch=metarepo_branch,
                 metarepo_commit_hash=metarepo_commit_hash,
                 imported_submodules=dict(),
                 tracked_nested_submodules=dict()
             )
-        
+            self.monorepo_branches[monorepo_branch] = entry
+
         # add the imported submodule
-        self.monorepo_branches[monorepo_branch].imported_submodules[submodule_relative_path] = ImportedSubmoduleInfo(
+        entry.imported_submodules[submodule_relative_path] = ImportedSubmoduleInfo(
             branch=submodule_branch,
             commit_hash=submodule_commit_hash
         )
 
-        # add the tracked nested submodules
+        # add the tracked nested submodules (their paths are relative to the submodule)
+        prefix = submodule_relative_path.rstrip("/") + "/"
+        tracked = entry.tracked_nested_submodules
         for nested in nested_submodules:
-            nested_relative_path = os.path.join(submodule_relative_path, nested.path)
-            self.monorepo_branches[monorepo_branch].tracked_nested_submodules[nested_relative_path] = SubmoduleTrackingInfo(
+            nested_relative_path = prefix + nested.path
+            tracked[nested_relative_path] = SubmoduleTrackingInfo(
                 url=nested.url,
                 commit_hash=nested.commit_hash
             )
 
     def register_submodule_from_metarepo_branch(self, monorepo_branch: str, metarepo_branch: str, metarepo_commit_hash: str, submodule_relative_path: str, submodule_branch: str, submodule_commit_hash: str, nested_submodules: List[SubmoduleDef]):
         # `metarepo_branch` here is used as the base of the submodule import
-        if metarepo_branch not in self.monorepo_branches:
+        base_entry = self.monorepo_branches.get(metarepo_branch)
+        if base_entry is None:
             raise ValueError(f"Monorepo branch {metarepo_branch} not registered yet in report.")
         
         # create the monorepo branch entry only if was not created by a previous submodule import.
         # i.e. there might be multiple submodules with the same "feature" branch, and "feautre" does not exist in the metarepo.
-        if monorepo_branch not in self.monorepo_branches:
-            self.monorepo_branches[monorepo_branch] = copy.deepcopy(self.monorepo_branches[metarepo_branch])
+        entry = self.monorepo_branches.get(monorepo_branch)
+        if entry is None:
+            # the info values are never mutated once registered, so the new branch may share them with its base
+            entry = MigrationReportEntry(
+                metarepo_branch=base_entry.metarepo_branch,
+                metarepo_commit_hash=base_entry.metarepo_commit_hash,
+                imported_submodules=dict(base_entry.imported_submodules),
+                tracked_nested_submodules=dict(base_entry.tracked_nested_submodules)
+            )
+            self.monorepo_branches[monorepo_branch] = entry
 
         # add the imported submodule
-        self.monorepo_branches[monorepo_branch].imported_submodules[submodule_relative_path] = ImportedSubmoduleInfo(
+        entry.imported_submodules[submodule_relative_path] = ImportedSubmoduleInfo(
             branch=submodule_branch,
             commit_hash=submodule_commit_hash
         )
 
-        # add the tracked nested submodules
+        # add the tracked nested submodules (their paths are relative to the submodule)
+        prefix = submodule_relative_path.rstrip("/") + "/"
+        tracked = entry.tracked_nested_submodules
         for nested in nested_submodules:
-            nested_relative_path = os.path.join(submodule_relative_path, nested.path)
-            self.monorepo_branches[monorepo_branch].tracked_nested_submodules[nested_relative_path] = SubmoduleTrackingInfo(
+            nested_relative_path = prefix + nested.path
+            tracked[nested_relative_path] = SubmoduleTrackingInfo(
                 url=nested.url,
                 commit_hash=nested.commit_hash
             )
 
 
     def __init__(self, report_info: MigrationImportInfo):
-        self.entries = []
+        self.monorepo_branches = dict()
         self.metarepo_name = report_info.metarepo_name
         self.monorepo_name = report_info.monorepo_name
         metarepo_default_branch = report_info.metarepo_default_branch
         
         # need to first populate the metarepo default branch,
-        # as it's report might serve as the base for other branches
+        # as it's report might serve as the base for other branches.
+        # all other branches are deferred and registered after it, in their original order.
+        deferred: List[Tuple[str, SubmoduleImportInfoEntry, bool]] = []
         for submodule_relative_path, submodule_info in report_info.submodules_info.items():
+            default_branches = (metarepo_default_branch, submodule_info.submodule_default_branch)
             for entry in submodule_info.entries:
                 is_metarepo_default_branch = entry.metarepo_branch == metarepo_default_branch
-                is_submodule_branch_same_or_default = entry.submodule_branch in [metarepo_default_branch, submodule_info.submodule_default_branch]
-                if is_metarepo_default_branch and is_submodule_branch_same_or_default:
+                if is_metarepo_default_branch and entry.submodule_branch in default_branches:
                     self.register_submodule_import(entry.monorepo_branch, entry.metarepo_branch, entry.metarepo_commit_hash, submodule_relative_path, entry.submodule_branch, entry.submodule_commit_hash, entry.submodule_nested_submodules)
+                else:
+                    # a submodule feature branch imported on top of the metarepo default branch is registered from it
+                    deferred.append((submodule_relative_path, entry, is_metarepo_default_branch))
 
         # now populate all other branches
-        for submodule_relative_path, submodule_info in report_info.submodules_info.items():
-            for entry in submodule_info.entries:
-                    # need to decide if this submodule feature branch needs to be registered from the metarepo default branch
-                    is_metarepo_default_branch = entry.metarepo_branch == metarepo_default_branch
-                    is_submodule_branch_same_or_default = entry.submodule_branch in [metarepo_default_branch, submodule_info.submodule_default_branch]
-                    if is_metarepo_default_branch:
-                        if is_submodule_branch_same_or_default:
-                            # already registered in the first pass
-                            continue
-                        else:
-                            self.register_submodule_from_metarepo_branch(entry.monorepo_branch, metarepo_default_branch, entry.metarepo_commit_hash, submodule_relative_path, entry.submodule_branch, entry.submodule_commit_hash, entry.submodule_nested_submodules)
-                    else:
-                        self.register_submodule_import(entry.monorepo_branch, entry.metarepo_branch, entry.metarepo_commit_hash, submodule_relative_path, entry.submodule_branch, entry.submodule_commit_hash, entry.submodule_nested_submodules)
-                
+        for submodule_relative_path, entry, from_metarepo_default_branch in deferred:
+            if from_metarepo_default_branch:
+                self.register_submodule_from_metarepo_branch(entry.monorepo_branch, metarepo_default_branch, entry.metarepo_commit_hash, submodule_relative_path, entry.submodule_branch, entry.submodule_commit_hash, entry.submodule_nested_submodules)
+            else:
+                self.register_submodule_import(entry.monorepo_branch, entry.metarepo_branch, entry.metarepo_commit_hash, submodule_relative_path, entry.submodule_branch, entry.submodule_commit_hash, entry.submodule_nested_submodules)
+
     def __str__(self):
-        s = "Migration Report:\n"
+        # the report can span many branches and submodules, write it into a single growing buffer
+        buf = io.StringIO()
+        w = buf.write
+        w("Migration Report:\n")
         for monorepo_branch, entry in self.monorepo_branches.items():
-            s += f"\n{self.monorepo_name} branch: {monorepo_branch}\n"
-            s += f"  Imported branches:\n"
-            s += f"  - {self.metarepo_name}: branch={entry.metarepo_branch}, commit={entry.metarepo_commit_hash}\n"
+            w(f"\n{self.monorepo_name} branch: {monorepo_branch}\n")
+            w("  Imported branches:\n")
+            w(f"  - {self.metarepo_name}: branch={entry.metarepo_branch}, commit={entry.metarepo_commit_hash}\n")
             for submodule_path, submodule_info in entry.imported_submodules.items():
-                s += f"  - {submodule_path}: branch={submodule_info.branch}, commit={submodule_info.commit_hash}\n"
-            s += f"  Tracked git submodules:\n" if len(entry.tracked_nested_submodules) > 0 else ""
+                w(f"  - {submodule_path}: branch={submodule_info.branch}, commit={submodule_info.commit_hash}\n")
+            if entry.tracked_nested_submodules:
+                w("  Tracked git submodules:\n")
             for nested_path, tracking_info in entry.tracked_nested_submodules.items():
-                s += f"  - {nested_path}: url={tracking_info.url}, commit={tracking_info.commit_hash}\n"
-        return s
+                w(f"  - {nested_path}: url={tracking_info.url}, commit={tracking_info.commit_hash}\n")
+        return buf.getvalue()
     
     def as_dict(self):
         return {
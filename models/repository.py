@@ -4,7 +4,7 @@ from dataclasses_json import dataclass_json
 
 
 @dataclass_json
-@dataclass
+@dataclass(slots=True)
 class FileContent:
     filename: str
     content: str
@@ -12,20 +12,20 @@ class FileContent:
 
 
 @dataclass_json
-@dataclass
+@dataclass(slots=True)
 class BranchContent:
     name: str
     files: List[FileContent]
 
 
 @dataclass_json
-@dataclass
+@dataclass(slots=True)
 class RepoContent:
     default_branch: str
     branches: List[BranchContent]
 
 @dataclass_json
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SubmoduleDef:
     """
     `path`: relative to the repo root  
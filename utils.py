@@ -1,7 +1,9 @@
 import subprocess
+import sys
 from dataclasses import dataclass
-import json
+from typing import List, Union
 import os
+import shlex
 
 @dataclass
 class CmdResult:
@@ -9,45 +11,84 @@ class CmdResult:
     stdout: str
     stderr: str
 
-def exec_cmd(cmd: str, cwd: str = None, verbose: bool = True, verbose_output: bool = False, allow_failure: bool = False) -> CmdResult:
+OUTPUT_MODES = ("capture", "inherit", "discard")
+
+def exec_cmd(cmd: Union[str, List[str]], cwd: str = None, verbose: bool = True, verbose_output: bool = False, allow_failure: bool = False, output: str = "capture") -> CmdResult:
     """
-    Execute a shell command and return the result.
+    Execute a command and return the result.
+    `cmd` is either a shell command string, or an argv list which is executed directly (no shell is spawned).
+    `output` selects where the command output goes:
+    - "capture": stdout/stderr are buffered and returned (default).
+    - "inherit": stdout is streamed to the inherited stdout instead of being returned. stderr is still captured to report
+      failures, and is written to `sys.stderr` once the command is done. When `sys.stdout` was replaced (e.g. by the `Tee`
+      of merger's `--dump-log`), the command can't write to it directly, so stdout is captured and written to `sys.stdout`.
+    - "discard": stdout goes to /dev/null for callers that don't need it, stderr is still captured to report failures.
     """
+    if output not in OUTPUT_MODES:
+        raise RuntimeError(f"Unknown output mode '{output}', expected one of {', '.join(OUTPUT_MODES)}")
+    shell = isinstance(cmd, str)
+    cmd_display = cmd if shell else shlex.join(cmd)
     if verbose:
-        print(f"Executing command: {cmd} (cwd={cwd or '.'})")
-    proc = subprocess.run(cmd, shell=True, cwd=cwd, capture_output=True, text=True)
+        print(f"Executing command: {cmd_display} (cwd={cwd or '.'})")
+    if output == "discard":
+        proc = subprocess.run(cmd, shell=shell, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elif output == "inherit":
+        stdout_redirected = sys.stdout is not sys.__stdout__
+        proc = subprocess.run(cmd, shell=shell, cwd=cwd, stdout=subprocess.PIPE if stdout_redirected else None, stderr=subprocess.PIPE, text=True)
+        if stdout_redirected and proc.stdout:
+            sys.stdout.write(proc.stdout)
+        # on failure stderr is printed with the error below
+        if proc.returncode == 0 and proc.stderr:
+            sys.stderr.write(proc.stderr)
+    else:
+        proc = subprocess.run(cmd, shell=shell, cwd=cwd, capture_output=True, text=True)
+    stdout = proc.stdout or ""
+    stderr = proc.stderr or ""
     if verbose_output:
-        print(f"Command stdout: {proc.stdout}")
-        print(f"Command stderr: {proc.stderr}")
+        print(f"Command stdout: {stdout}")
+        print(f"Command stderr: {stderr}")
     if proc.returncode != 0:
-        print(f"Command '{cmd}' failed with return code {proc.returncode}")
-        if proc.stderr:
-            print(f"Error output: {proc.stderr}")            
+        print(f"Command '{cmd_display}' failed with return code {proc.returncode}")
+        if stderr:
+            print(f"Error output: {stderr}")            
         if not allow_failure:
-            raise RuntimeError(f"Command '{cmd}' failed with return code {proc.returncode}\n{proc.stderr}\n{proc.stdout}")
-    return CmdResult(proc.returncode, proc.stdout, proc.stderr)
+            raise RuntimeError(f"Command '{cmd_display}' failed with return code {proc.returncode}\n{stderr}\n{stdout}")
+    return CmdResult(proc.returncode, stdout, stderr)
 
 
 def listdir_list(path):
     tree = []
-    for entry in os.listdir(path):
-        if entry.startswith('.git'):
-            continue
-        full = os.path.join(path, entry)
-        if os.path.isdir(full):
-            # For directories, include a tuple: (name, nested_list)
-            tree.append([entry, listdir_list(full)])
-        else:
-            # For files, just include the name
-            tree.append(entry)
+    # scandir entries know their type, no extra stat per entry.
+    # symlinks are listed as names without following them, which also can't loop
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.git'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                # For directories, include a tuple: (name, nested_list)
+                tree.append([entry.name, listdir_list(entry.path)])
+            else:
+                # For files, just include the name
+                tree.append(entry.name)
     return tree
 
 def pretty_print_list(nested_list, indent=4):
     """
-    Returns a pretty-printed string of a nested list.
+    Returns a pretty-printed string of a nested list (as built by `listdir_list`),
+    one entry per line with directory contents indented below the directory.
     """
-    nested_as_json = json.dumps(nested_list, indent=indent)
-    return nested_as_json
+    lines = []
+    def walk(entries, depth):
+        pad = " " * (indent * depth)
+        for entry in entries:
+            if isinstance(entry, list):
+                name, children = entry
+                lines.append(f"{pad}{name}/")
+                walk(children, depth + 1)
+            else:
+                lines.append(f"{pad}{entry}")
+    walk(nested_list, 0)
+    return "\n".join(lines)
 
 def header_string(msg: str) -> str:
     msg = "=== " + msg + " ==="